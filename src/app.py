@@ -1,34 +1,66 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, validator
 from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
 import logging
 import traceback
 import sys
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+import httpx
+from openai import AsyncOpenAI
 
 # Import our custom classes
 from .content_processor import ContentProcessor
 from .content_enricher import ContentEnricher
 from .content_generator import ContentGenerator
+from .github_graphql import create_http_client
+from .orjson_route import ORJSONRoute
+
+# .env file two directories up from this module
+env_path = Path(__file__).parents[2] / '.env'
 
-# Load environment variables from .env file
-env_path = Path(__file__).parents[2] / '.env'  # Go up two directories to find .env
-load_dotenv(dotenv_path=env_path)
-
-# Configure logging with more details
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load environment variables from .env files: the explicit path first, then the
+    # nearest .env found searching up from src/ (the repo root), as main.py does
+    load_dotenv(dotenv_path=env_path)
+    load_dotenv()
+
+    # Configure logging with more details
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+    logger.info("Starting up application...")
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if not openai_api_key:
+        logger.warning("OpenAI API key not found in environment variables!")
+    else:
+        logger.info("OpenAI API key found in environment variables")
+
+    # Clients shared by all requests so connections to GitHub and OpenAI stay alive
+    app.state.gh_http = create_http_client()
+    app.state.openai = AsyncOpenAI(api_key=openai_api_key) if openai_api_key else None
+
+    yield
+
+    logger.info("Shutting down application...")
+    await app.state.gh_http.aclose()
+    if app.state.openai is not None:
+        await app.state.openai.close()
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+app.router.route_class = ORJSONRoute
 
 # Configure CORS
 app.add_middleware(
@@ -65,11 +97,45 @@ class GenerationRequest(BaseModel):
     processed_content: Dict[str, Any]
     content_type: str
 
-@app.post("/api/fetch-github-content")
-async def fetch_github_content(request: GithubContentRequest):
+class PullRequestItem(BaseModel):
+    number: int
+    title: str
+    body: str
+    created_at: str
+    state: str
+    url: str
+    author: str
+    labels: List[str]
+    merged: bool
+
+class PullRequestList(BaseModel):
+    pull_requests: List[PullRequestItem]
+    message: Optional[str] = None
+
+async def get_github_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.gh_http
+
+async def get_openai_client(request: Request) -> Optional[AsyncOpenAI]:
+    return request.app.state.openai
+
+async def get_openai_key() -> str:
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if not openai_api_key:
+        logger.error("OpenAI API key not found in environment variables")
+        raise HTTPException(
+            status_code=500,
+            detail="OpenAI API key not configured"
+        )
+    return openai_api_key
+
+@app.post("/api/fetch-github-content", response_model=PullRequestList, response_model_exclude_none=True)
+async def fetch_github_content(
+    request: GithubContentRequest,
+    http_client: httpx.AsyncClient = Depends(get_github_client)
+):
     try:
         logger.info(f"Starting fetch_github_content with repo: {request.repo_name}")
-        logger.debug(f"Request data: repo_name={request.repo_name}, days_back={request.days_back}")
+        logger.debug("Request data: repo_name=%s, days_back=%s", request.repo_name, request.days_back)
         
         try:
             # Create processor with config including optional token
@@ -78,7 +144,7 @@ async def fetch_github_content(request: GithubContentRequest):
                 config['github_token'] = request.github_token
                 
             logger.debug("Creating ContentProcessor...")
-            processor = ContentProcessor(config)
+            processor = ContentProcessor(config, http_client=http_client)
             logger.debug("ContentProcessor initialized successfully")
         except ValueError as ve:
             logger.error(f"Validation error: {str(ve)}")
@@ -97,16 +163,10 @@ async def fetch_github_content(request: GithubContentRequest):
                 "days_back": request.days_back
             }
             
-            logger.debug(f"Calling fetch_github_content with params: {params}")
-            content = processor.fetch_github_content(params)
-            
-            if not isinstance(content, dict):
-                raise ValueError(f"Expected dict, got {type(content)}")
-                
-            if 'pull_requests' not in content:
-                raise ValueError("Response missing 'pull_requests' key")
+            logger.debug("Calling fetch_github_content with params: %s", params)
+            content = await processor.fetch_github_content(params)
             
-            if not content.get('pull_requests'):
+            if not content['pull_requests']:
                 logger.info("No pull requests found")
                 return {
                     'pull_requests': [],
@@ -131,21 +191,14 @@ async def fetch_github_content(request: GithubContentRequest):
         )
 
 @app.post("/api/enrich-content")
-async def enrich_content(request: EnrichmentRequest):
+async def enrich_content(
+    request: EnrichmentRequest,
+    http_client: httpx.AsyncClient = Depends(get_github_client),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+    openai_api_key: str = Depends(get_openai_key)
+):
     try:
         logger.info(f"Starting content enrichment for repo: {request.repo_name}")
-        
-        # Get OpenAI API key from environment with debug logging
-        openai_api_key = os.getenv('OPENAI_API_KEY')
-        logger.debug(f"OpenAI API key present: {'Yes' if openai_api_key else 'No'}")
-        
-        if not openai_api_key:
-            logger.error("OpenAI API key not found in environment variables")
-            logger.debug(f"Available environment variables: {list(os.environ.keys())}")
-            raise HTTPException(
-                status_code=500,
-                detail="OpenAI API key not configured"
-            )
 
         try:
             # Create enricher with config including optional token
@@ -153,9 +206,9 @@ async def enrich_content(request: EnrichmentRequest):
             if request.github_token:
                 config['github_token'] = request.github_token
                 
-            enricher = ContentEnricher(config)
+            enricher = ContentEnricher(config, http_client=http_client, openai_client=openai_client)
             
-            enriched_content = enricher.enrich_content(
+            enriched_content = await enricher.enrich_content(
                 repo_name=request.repo_name,
                 selected_items=request.selected_items
             )
@@ -181,22 +234,18 @@ async def enrich_content(request: EnrichmentRequest):
         )
 
 @app.post("/api/generate-content")
-async def generate_content(request: GenerationRequest):
+async def generate_content(
+    request: GenerationRequest,
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+    openai_api_key: str = Depends(get_openai_key)
+):
     try:
         logger.info(f"Starting content generation with type: {request.content_type}")
-        
-        # Get OpenAI API key from environment
-        openai_api_key = os.getenv('OPENAI_API_KEY')
-        if not openai_api_key:
-            raise HTTPException(
-                status_code=500,
-                detail="OpenAI API key not configured"
-            )
 
         try:
-            generator = ContentGenerator(openai_api_key=openai_api_key)
+            generator = ContentGenerator(openai_api_key=openai_api_key, openai_client=openai_client)
             
-            generated_content = generator.generate_content(
+            generated_content = await generator.generate_content(
                 content=request.processed_content,
                 content_type=request.content_type
             )
@@ -221,11 +270,20 @@ async def generate_content(request: GenerationRequest):
             detail=f"Failed to generate content: {str(e)}"
         )
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Starting up application...")
-    openai_api_key = os.getenv('OPENAI_API_KEY')
-    if not openai_api_key:
-        logger.warning("OpenAI API key not found in environment variables!")
-    else:
-        logger.info("OpenAI API key found in environment variables")
\ No newline at end of file
+@app.post("/api/generate-content/stream")
+async def stream_generated_content(
+    request: GenerationRequest,
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+    openai_api_key: str = Depends(get_openai_key)
+):
+    logger.info(f"Starting streamed content generation with type: {request.content_type}")
+
+    generator = ContentGenerator(openai_api_key=openai_api_key, openai_client=openai_client)
+    
+    return StreamingResponse(
+        generator.stream_content(
+            content=request.processed_content,
+            content_type=request.content_type
+        ),
+        media_type="text/event-stream"
+    )
@@ -1,23 +1,78 @@
 import os
-from github import Github
-from typing import List, Dict, Any
+import asyncio
+import json
+from typing import List, Dict, Any, Optional
 import logging
-from openai import OpenAI
-from dotenv import load_dotenv
+import httpx
+from openai import AsyncOpenAI
 
-load_dotenv()
+from .github_graphql import execute_query, get_http_client, split_repo_name
+from .llm_cache import cache_completion, get_cached_completion, prompt_key
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of OpenAI analysis requests in flight at the same time
+MAX_CONCURRENT_ITEMS = 8
+
+ANALYSIS_MODEL = "gpt-4o-mini"
+ANALYSIS_SYSTEM_PROMPT = "You are a code review assistant. Analyze the pull request and provide insights."
+
+# Number of PRs analyzed per OpenAI request
+ANALYSIS_BATCH_SIZE = 8
+
+BATCH_ANALYSIS_INSTRUCTIONS = (
+    "Analyze each of the following pull requests. Respond with a JSON object of the form "
+    '{"analyses": [{"number": <PR number>, "summary": "<your insights>"}]} '
+    "containing exactly one entry per pull request.\n\n"
+)
+
+# Number of PRs requested per aliased GraphQL query
+PULL_REQUESTS_PER_QUERY = 20
+
+# Maximum number of GitHub queries in flight at the same time
+MAX_CONCURRENT_GITHUB_QUERIES = 8
+
+# Number of files and commits fetched per PR; totals come from changedFiles and commits.totalCount
+DETAIL_LIMIT = 5
+
+PULL_REQUEST_DETAILS_FRAGMENT = """
+fragment PullRequestDetails on PullRequest {
+  number
+  title
+  body
+  state
+  merged
+  additions
+  deletions
+  changedFiles
+  files(first: %(limit)d) { nodes { path additions deletions changeType } }
+  commits(first: %(limit)d) { totalCount nodes { commit { oid message author { name } } } }
+}
+""" % {'limit': DETAIL_LIMIT}
+
+# GraphQL PatchStatus values mapped to the REST file status names
+FILE_STATUSES = {
+    'ADDED': 'added',
+    'DELETED': 'removed',
+    'MODIFIED': 'modified',
+    'RENAMED': 'renamed',
+    'COPIED': 'copied',
+    'CHANGED': 'changed'
+}
+
 class ContentEnricher:
-    def __init__(self, config=None):
+    def __init__(
+        self,
+        config=None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        openai_client: Optional[AsyncOpenAI] = None
+    ):
         self.config = config if config is not None else {}
         self.github_token = self._get_github_token()
-        self.openai_api_key = self._get_openai_key()
         
-        # Initialize clients
-        self.github = Github(self.github_token)
-        self.openai_client = OpenAI(api_key=self.openai_api_key)
+        # Reuse shared clients when provided, otherwise create our own
+        self.http_client = http_client or get_http_client()
+        self.openai_client = openai_client or AsyncOpenAI(api_key=self._get_openai_key())
 
     def _get_github_token(self):
         # Use user-provided token if available, otherwise fall back to default
@@ -39,62 +94,38 @@ class ContentEnricher:
     def _get_openai_key(self):
         return os.getenv('OPENAI_API_KEY')
 
-    def enrich_content(self, repo_name: str, selected_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def enrich_content(self, repo_name: str, selected_items: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Enrich the selected content items with additional information.
         """
         try:
             logger.info(f"Starting content enrichment for {len(selected_items)} items")
             
-            # Get repository
-            repo = self.github.get_repo(repo_name)
-            enriched_prs = []
+            pr_numbers = [
+                int(item['number']) for item in selected_items
+                if item.get('type') == 'pull_request' and item.get('number') is not None
+            ]
+            
+            # Fetch every selected PR with its files and commits in as few round trips as possible
+            pull_requests = await self._fetch_pull_requests(repo_name, pr_numbers)
+
+            # Analyze PRs in batches, running the batches concurrently within OpenAI rate limits
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_ITEMS)
+            batches = [
+                pull_requests[i:i + ANALYSIS_BATCH_SIZE]
+                for i in range(0, len(pull_requests), ANALYSIS_BATCH_SIZE)
+            ]
+            tasks = [self._analyze_batch(batch, semaphore) for batch in batches]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
 
-            for item in selected_items:
-                try:
-                    if item['type'] == 'pull_request':
-                        pr_number = item['number']
-                        pr = repo.get_pull(pr_number)
-                        
-                        # Get PR details
-                        files_changed = list(pr.get_files())
-                        commits = list(pr.get_commits())
-                        
-                        # Prepare file changes summary
-                        file_changes = [{
-                            'filename': f.filename,
-                            'additions': f.additions,
-                            'deletions': f.deletions,
-                            'status': f.status
-                        } for f in files_changed]
-
-                        # Prepare commit summary
-                        commit_summary = [{
-                            'sha': c.sha,
-                            'message': c.commit.message,
-                            'author': c.commit.author.name if c.commit.author else 'Unknown'
-                        } for c in commits]
-
-                        # Enrich with OpenAI analysis
-                        analysis = self._analyze_pr_with_ai(pr, file_changes, commit_summary)
-
-                        enriched_pr = {
-                            'number': pr_number,
-                            'title': pr.title,
-                            'body': pr.body or '',
-                            'state': pr.state,
-                            'merged': pr.merged,
-                            'files_changed': file_changes,
-                            'commits': commit_summary,
-                            'analysis': analysis
-                        }
-                        
-                        enriched_prs.append(enriched_pr)
-                        logger.debug(f"Successfully enriched PR #{pr_number}")
-                        
-                except Exception as e:
-                    logger.error(f"Error enriching item {item}: {str(e)}")
+            enriched_prs = []
+            for batch, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error enriching PRs {[pr['number'] for pr in batch]}: {str(result)}")
                     continue
+                for pr, analysis in zip(batch, result):
+                    enriched_prs.append({**pr, 'analysis': analysis})
+                    logger.debug("Successfully enriched PR #%s", pr['number'])
 
             return {'pull_requests': enriched_prs}
             
@@ -102,62 +133,223 @@ class ContentEnricher:
             logger.error(f"Error in enrich_content: {str(e)}")
             raise
 
-    def _analyze_pr_with_ai(self, pr, file_changes, commit_summary) -> Dict[str, str]:
+    async def _fetch_pull_requests(self, repo_name: str, pr_numbers: List[int]) -> List[Dict[str, Any]]:
+        """
+        Fetch the given PRs through batched GraphQL queries, preserving their order.
+        """
+        owner, name = split_repo_name(repo_name)
+        batches = [
+            pr_numbers[i:i + PULL_REQUESTS_PER_QUERY]
+            for i in range(0, len(pr_numbers), PULL_REQUESTS_PER_QUERY)
+        ]
+        
+        # Bounded so large selections don't trip GitHub's secondary rate limits
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_GITHUB_QUERIES)
+
+        async def query_batch(batch: List[int]) -> Dict[str, Any]:
+            async with semaphore:
+                return await execute_query(
+                    self.http_client,
+                    self.github_token,
+                    self._build_pull_requests_query(batch),
+                    {'owner': owner, 'name': name},
+                    allow_partial=True
+                )
+
+        responses = await asyncio.gather(*[query_batch(batch) for batch in batches])
+
+        pull_requests = []
+        for batch, data in zip(batches, responses):
+            repository = data.get('repository')
+            if repository is None:
+                raise Exception(f"Repository '{repo_name}' not found. Please check the repository name.")
+            
+            for pr_number in batch:
+                node = repository.get(f"pr{pr_number}")
+                if node is None:
+                    logger.error(f"Pull request #{pr_number} not found in {repo_name}")
+                    continue
+                pull_requests.append(self._parse_pull_request(node))
+        
+        return pull_requests
+
+    def _build_pull_requests_query(self, pr_numbers: List[int]) -> str:
+        aliases = "\n".join(
+            f"    pr{number}: pullRequest(number: {number}) {{ ...PullRequestDetails }}"
+            for number in pr_numbers
+        )
+        return (
+            "query($owner: String!, $name: String!) {\n"
+            "  repository(owner: $owner, name: $name) {\n"
+            f"{aliases}\n"
+            "  }\n"
+            "}\n"
+            f"{PULL_REQUEST_DETAILS_FRAGMENT}"
+        )
+
+    def _parse_pull_request(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        # Prepare file changes summary
+        file_changes = [{
+            'filename': f['path'],
+            'additions': f['additions'],
+            'deletions': f['deletions'],
+            'status': FILE_STATUSES.get(f['changeType'], f['changeType'].lower())
+        } for f in node['files']['nodes']]
+
+        # Prepare commit summary
+        commit_summary = [{
+            'sha': c['commit']['oid'],
+            'message': c['commit']['message'],
+            'author': c['commit']['author']['name'] if c['commit']['author'] else 'Unknown'
+        } for c in node['commits']['nodes']]
+
+        pr = {
+            'number': node['number'],
+            'title': node['title'],
+            'body': node['body'] or '',
+            'state': 'open' if node['state'] == 'OPEN' else 'closed',
+            'merged': node['merged'],
+            'additions': node['additions'],
+            'deletions': node['deletions'],
+            'files_changed_count': node['changedFiles'],
+            'commits_count': node['commits']['totalCount'],
+            'files_changed': file_changes,
+            'commits': commit_summary
+        }
+
+        # Built once and returned with the enriched PR so content generation can reuse it
+        pr['prompt_context'] = self._build_context(pr, file_changes, commit_summary)
+        return pr
+
+    async def _analyze_batch(self, prs: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> List[Dict[str, str]]:
+        if len(prs) > 1:
+            async with semaphore:
+                analyses = await self._analyze_prs_batch(prs)
+            if analyses is not None:
+                return analyses
+
+        # Each per-PR call takes its own slot so fallbacks stay within MAX_CONCURRENT_ITEMS
+        async def analyze_one(pr: Dict[str, Any]) -> Dict[str, str]:
+            async with semaphore:
+                return await self._analyze_pr_with_ai(pr, pr['files_changed'], pr['commits'])
+
+        return list(await asyncio.gather(*[analyze_one(pr) for pr in prs]))
+
+    async def _analyze_prs_batch(self, prs: List[Dict[str, Any]]) -> Optional[List[Dict[str, str]]]:
+        """
+        Analyze several PRs with a single OpenAI call. Returns None if the
+        structured response cannot be parsed, so the caller can analyze the
+        PRs individually.
+        """
+        prompt = BATCH_ANALYSIS_INSTRUCTIONS + "\n\n".join(
+            f"PR #{pr['number']}:\n{pr['prompt_context']}"
+            for pr in prs
+        )
+
+        try:
+            key = prompt_key(ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT, prompt)
+            content = get_cached_completion(key)
+            
+            if content is None:
+                response = await self.openai_client.chat.completions.create(
+                    model=ANALYSIS_MODEL,
+                    messages=[
+                        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={"type": "json_object"}
+                )
+                content = response.choices[0].message.content
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Using cached analysis for PRs %s", [pr['number'] for pr in prs])
+        except Exception as e:
+            logger.error(f"Error in batched AI analysis: {str(e)}")
+            return [self._failed_analysis() for _ in prs]
+
+        try:
+            summaries = {
+                int(analysis['number']): analysis['summary']
+                for analysis in json.loads(content)['analyses']
+            }
+            missing = [pr['number'] for pr in prs if not summaries.get(pr['number'])]
+            if missing:
+                raise ValueError(f"no analysis returned for PRs {missing}")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not parse batched AI analysis, analyzing PRs individually: {str(e)}")
+            return None
+
+        cache_completion(key, content)
+        return [{
+            'summary': summaries[pr['number']],
+            'complexity': self._assess_complexity(pr),
+            'impact': self._assess_impact(pr)
+        } for pr in prs]
+
+    async def _analyze_pr_with_ai(self, pr, file_changes, commit_summary) -> Dict[str, str]:
         """
         Use OpenAI to analyze the PR and generate insights.
         """
         try:
             # Prepare context for AI
-            context = f"""
-            Pull Request Title: {pr.title}
-            Description: {pr.body or 'No description provided'}
-            
-            Files Changed: {len(file_changes)}
-            Total Commits: {len(commit_summary)}
-            
-            File Changes Summary:
-            {self._format_file_changes(file_changes)}
+            context = pr.get('prompt_context') or self._build_context(pr, file_changes, commit_summary)
+
+            key = prompt_key(ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT, context)
+            summary = get_cached_completion(key)
             
-            Commit Messages:
-            {self._format_commits(commit_summary)}
-            """
-
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a code review assistant. Analyze the pull request and provide insights."},
-                    {"role": "user", "content": context}
-                ]
-            )
+            if summary is None:
+                response = await self.openai_client.chat.completions.create(
+                    model=ANALYSIS_MODEL,
+                    messages=[
+                        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                        {"role": "user", "content": context}
+                    ]
+                )
+                summary = response.choices[0].message.content
+                cache_completion(key, summary)
+            else:
+                logger.debug("Using cached analysis for PR #%s", pr['number'])
 
             return {
-                'summary': response.choices[0].message.content,
-                'complexity': self._assess_complexity(file_changes),
-                'impact': self._assess_impact(file_changes, commit_summary)
+                'summary': summary,
+                'complexity': self._assess_complexity(pr),
+                'impact': self._assess_impact(pr)
             }
             
         except Exception as e:
             logger.error(f"Error in AI analysis: {str(e)}")
-            return {
-                'summary': "AI analysis failed",
-                'complexity': "Unknown",
-                'impact': "Unknown"
-            }
+            return self._failed_analysis()
+
+    def _failed_analysis(self) -> Dict[str, str]:
+        return {
+            'summary': "AI analysis failed",
+            'complexity': "Unknown",
+            'impact': "Unknown"
+        }
+
+    def _build_context(self, pr, file_changes, commit_summary) -> str:
+        return (
+            f"Pull Request Title: {pr['title']}\n"
+            f"Description: {pr['body'] or 'No description provided'}\n\n"
+            f"Files Changed: {pr['files_changed_count']}\n"
+            f"Total Commits: {pr['commits_count']}\n\n"
+            f"File Changes Summary:\n{self._format_file_changes(file_changes)}\n\n"
+            f"Commit Messages:\n{self._format_commits(commit_summary)}\n"
+        )
 
     def _format_file_changes(self, file_changes) -> str:
         return "\n".join([
             f"- {f['filename']}: +{f['additions']}, -{f['deletions']}, {f['status']}"
-            for f in file_changes[:5]  # Limit to first 5 files
+            for f in file_changes[:DETAIL_LIMIT]
         ])
 
     def _format_commits(self, commits) -> str:
         return "\n".join([
             f"- {c['message']}"
-            for c in commits[:5]  # Limit to first 5 commits
+            for c in commits[:DETAIL_LIMIT]
         ])
 
-    def _assess_complexity(self, file_changes) -> str:
-        total_changes = sum(f['additions'] + f['deletions'] for f in file_changes)
+    def _assess_complexity(self, pr) -> str:
+        total_changes = pr['additions'] + pr['deletions']
         if total_changes < 50:
             return "Low"
         elif total_changes < 200:
@@ -165,11 +357,12 @@ class ContentEnricher:
         else:
             return "High"
 
-    def _assess_impact(self, file_changes, commits) -> str:
+    def _assess_impact(self, pr) -> str:
         # Simple impact assessment based on number of files and commits
-        if len(file_changes) < 3 and len(commits) < 3:
+        files_count, commits_count = pr['files_changed_count'], pr['commits_count']
+        if files_count < 3 and commits_count < 3:
             return "Low"
-        elif len(file_changes) < 10 and len(commits) < 10:
+        elif files_count < 10 and commits_count < 10:
             return "Medium"
         else:
             return "High"
\ No newline at end of file
@@ -1,81 +1,164 @@
-from typing import Dict, List, Any
+from typing import Dict, Any, AsyncIterator, Optional
 import logging
 import traceback
-import sys
-from datetime import datetime
-from openai import OpenAI
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import time
+from datetime import datetime, timezone
+import orjson
+from openai import AsyncOpenAI
+
+from .llm_cache import cache_completion, get_cached_completion, prompt_key
+
 logger = logging.getLogger(__name__)
 
+GENERATION_MODEL = "gpt-4o-mini"
+GENERATION_SYSTEM_PROMPT = "You are a technical writer creating content from GitHub pull requests."
+
+# (ISO timestamp, epoch seconds it was taken at); reformatted at most once per second
+_timestamp_cache = ("", 0.0)
+
+def _current_timestamp() -> str:
+    global _timestamp_cache
+    now = time.time()
+    timestamp, taken_at = _timestamp_cache
+    if now - taken_at >= 1.0:
+        timestamp = datetime.fromtimestamp(now, tz=timezone.utc).isoformat()
+        _timestamp_cache = (timestamp, now)
+    return timestamp
+
 class ContentGenerator:
-    def __init__(self, openai_api_key: str):
-        self.client = OpenAI(api_key=openai_api_key)
+    # Only the selected template is formatted per request
+    _PROMPT_TEMPLATES = {
+        'blog_post': (
+            "Write a technical blog post about the following changes:\n"
+            "{summaries}\n"
+            "Focus on the key features, improvements, and their impact.\n"
+            "Format the post with proper headings, sections, and technical details.\n"
+        ),
+        'release_notes': (
+            "Create release notes from these changes:\n"
+            "{summaries}\n"
+            "Group the changes by type (features, fixes, improvements).\n"
+            "Keep it concise but informative.\n"
+        ),
+        'tweet': (
+            "Write an engaging tweet thread (3-5 tweets) about these updates:\n"
+            "{summaries}\n"
+            "Focus on the most important changes and their benefits.\n"
+            "Format with tweet numbers (1/X).\n"
+            "Keep each tweet within 280 characters.\n"
+        ),
+        'feature_page': (
+            "Create a feature page describing these changes:\n"
+            "{summaries}\n"
+            "Include:\n"
+            "- Feature overview\n"
+            "- Key benefits\n"
+            "- Technical details\n"
+            "- Example use cases\n"
+        )
+    }
+
+    def __init__(self, openai_api_key: Optional[str] = None, openai_client: Optional[AsyncOpenAI] = None):
+        # Reuse the shared client when provided, otherwise create our own
+        self.client = openai_client or AsyncOpenAI(api_key=openai_api_key)
 
-    def generate_content(self, content: Dict[str, Any], content_type: str) -> Dict[str, Any]:
+    async def generate_content(self, content: Dict[str, Any], content_type: str) -> Dict[str, Any]:
         try:
             # Generate the content using OpenAI
-            generated_text = self._generate_with_openai(content, content_type)
+            generated_text = await self._generate_with_openai(content, content_type)
             
             # Return in the expected format
             return {
                 "content": generated_text,
                 "contentType": content_type,
-                "metadata": {
-                    "timestamp": datetime.now().isoformat(),
-                    "version": "1.0"
-                }
+                "metadata": self._metadata()
             }
         except Exception as e:
             logger.error(f"Error generating content: {str(e)}")
             raise
 
-    def _generate_with_openai(self, content: Dict[str, Any], content_type: str) -> str:
+    async def stream_content(self, content: Dict[str, Any], content_type: str) -> AsyncIterator[str]:
+        """
+        Generate content as server-sent events, relaying OpenAI tokens as they arrive
+        and finishing with a metadata event.
+        """
         try:
-            # Extract PRs and their commits
-            prs = content.get('pull_requests', [])
-            logger.info(f"Generating {content_type} content for {len(prs)} pull requests")
+            prompt = self._build_prompt(content, content_type)
+            key = prompt_key(GENERATION_MODEL, GENERATION_SYSTEM_PROMPT, prompt)
+            generated_text = get_cached_completion(key)
             
-            # Create a summary of all PRs and their changes
-            pr_summaries = []
-            for pr in prs:
-                commits_summary = "\n".join([
-                    f"- {commit.get('message', '')}: {commit.get('explanation', '')}"
-                    for commit in pr.get('commits', [])
-                ])
+            if generated_text is not None:
+                logger.debug("Using cached OpenAI completion")
+                yield self._sse_event({"content": generated_text})
+            else:
+                logger.debug("Streaming request to OpenAI...")
+                stream = await self.client.chat.completions.create(
+                    model=GENERATION_MODEL,
+                    messages=[
+                        {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=1000,
+                    temperature=0.7,
+                    stream=True
+                )
                 
-                pr_summary = f"""
-                PR #{pr['number']}: {pr['title']}
-                {pr['body']}
+                parts = []
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield self._sse_event({"content": delta})
                 
-                Commits:
-                {commits_summary}
-                """
-                pr_summaries.append(pr_summary)
-
-            # Create prompt based on content type
-            prompt = self._create_prompt(pr_summaries, content_type)
+                cache_completion(key, "".join(parts).strip())
+                logger.info("Successfully streamed content")
             
-            logger.debug("Sending request to OpenAI...")
-            # Generate content using OpenAI
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a technical writer creating content from GitHub pull requests."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.7
+            yield self._sse_event(
+                {"contentType": content_type, "metadata": self._metadata()},
+                event="metadata"
             )
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error streaming content: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield self._sse_event({"detail": f"Failed to generate content: {str(e)}"}, event="error")
+
+    def _sse_event(self, data: Dict[str, Any], event: Optional[str] = None) -> str:
+        payload = f"data: {orjson.dumps(data).decode()}\n\n"
+        return f"event: {event}\n{payload}" if event else payload
+
+    def _metadata(self) -> Dict[str, Any]:
+        return {
+            "timestamp": _current_timestamp(),
+            "version": "1.0"
+        }
+
+    async def _generate_with_openai(self, content: Dict[str, Any], content_type: str) -> str:
+        try:
+            prompt = self._build_prompt(content, content_type)
+            
+            key = prompt_key(GENERATION_MODEL, GENERATION_SYSTEM_PROMPT, prompt)
+            generated_text = get_cached_completion(key)
+            
+            if generated_text is None:
+                logger.debug("Sending request to OpenAI...")
+                # Generate content using OpenAI
+                response = await self.client.chat.completions.create(
+                    model=GENERATION_MODEL,
+                    messages=[
+                        {"role": "system", "content": GENERATION_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=1000,
+                    temperature=0.7
+                )
+                generated_text = response.choices[0].message.content.strip()
+                cache_completion(key, generated_text)
+            else:
+                logger.debug("Using cached OpenAI completion")
 
-            generated_text = response.choices[0].message.content.strip()
             logger.info("Successfully generated content")
             
             return generated_text
@@ -85,42 +168,29 @@ class ContentGenerator:
             logger.error(traceback.format_exc())
             raise
 
-    def _create_prompt(self, pr_summaries: List[str], content_type: str) -> str:
-        summaries_text = "\n\n".join(pr_summaries)
-        
-        prompts = {
-            'blog_post': f"""
-                Write a technical blog post about the following changes:
-                {summaries_text}
-                
-                Focus on the key features, improvements, and their impact.
-                Format the post with proper headings, sections, and technical details.
-                """,
-            'release_notes': f"""
-                Create release notes from these changes:
-                {summaries_text}
-                
-                Group the changes by type (features, fixes, improvements).
-                Keep it concise but informative.
-                """,
-            'tweet': f"""
-                Write an engaging tweet thread (3-5 tweets) about these updates:
-                {summaries_text}
-                
-                Focus on the most important changes and their benefits.
-                Format with tweet numbers (1/X).
-                Keep each tweet within 280 characters.
-                """,
-            'feature_page': f"""
-                Create a feature page describing these changes:
-                {summaries_text}
-                
-                Include:
-                - Feature overview
-                - Key benefits
-                - Technical details
-                - Example use cases
-                """
-        }
+    def _build_prompt(self, content: Dict[str, Any], content_type: str) -> str:
+        # Extract PRs and their commits
+        prs = content.get('pull_requests', [])
+        logger.info(f"Generating {content_type} content for {len(prs)} pull requests")
         
-        return prompts.get(content_type, prompts['blog_post'])
\ No newline at end of file
+        # Create a summary of all PRs and their changes in a single join
+        parts = []
+        for pr in prs:
+            # Enriched PRs already carry the context assembled for their analysis
+            if pr.get('prompt_context'):
+                parts.append(f"PR #{pr['number']}:\n{pr['prompt_context']}\n\n")
+                continue
+            parts.append(f"PR #{pr['number']}: {pr['title']}\n{pr['body']}\n\nCommits:\n")
+            parts.extend(
+                f"- {commit.get('message', '')}: {commit.get('explanation', '')}\n"
+                for commit in pr.get('commits', [])
+            )
+            parts.append("\n\n")
+        summaries_text = "".join(parts)
+
+        # Create prompt based on content type
+        return self._create_prompt(summaries_text, content_type)
+
+    def _create_prompt(self, summaries_text: str, content_type: str) -> str:
+        template = self._PROMPT_TEMPLATES.get(content_type, self._PROMPT_TEMPLATES['blog_post'])
+        return template.format(summaries=summaries_text)
\ No newline at end of file
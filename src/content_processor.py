@@ -1,29 +1,82 @@
-from github import Github, GithubException
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Any
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple, Union
 import logging
 import traceback
-import sys
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Configure logging with more details
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import re
+import httpx
+import msgspec
+
+from .github_graphql import GitHubGraphQLError, execute_query, get_http_client, split_repo_name
+
 logger = logging.getLogger(__name__)
 
+PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: 100, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        body
+        createdAt
+        state
+        url
+        merged
+        author { login }
+        labels(first: 20) { nodes { name } }
+      }
+    }
+  }
+}
+"""
+
+# Output categories; _categorize_item returns an index into this tuple
+CATEGORIES = ('code_changes', 'bug_fixes', 'features', 'documentation', 'other')
+CODE_CHANGES, BUG_FIXES, FEATURES, DOCUMENTATION, OTHER = range(len(CATEGORIES))
+
+# Items in processed content. Structs are slotted, so they are smaller and quicker
+# to build than dicts, and the "type" tag is written first when encoded to JSON.
+class _TrackerItem(msgspec.Struct, tag_field='type'):
+    number: Optional[int] = None
+    title: Optional[str] = None
+    body: Optional[str] = ''
+    url: Optional[str] = None
+    created_at: Optional[str] = None
+    author: Optional[str] = None
+    labels: List[str] = []
+
+class ProcessedPullRequest(_TrackerItem, tag='pull_request'):
+    pass
+
+class ProcessedIssue(_TrackerItem, tag='issue'):
+    pass
+
+class ProcessedCommit(msgspec.Struct, tag_field='type', tag='commit'):
+    sha: Optional[str] = None
+    message: Optional[str] = None
+    url: Optional[str] = None
+    created_at: Optional[str] = None
+    author: Optional[str] = None
+
+ProcessedItem = Union[ProcessedPullRequest, ProcessedIssue, ProcessedCommit]
+
 class ContentProcessor:
-    def __init__(self, config=None):
+    # Checked in priority order; patterns match substrings, so 'doc' also covers
+    # 'docs'/'documentation', 'fix' covers 'hotfix', 'feat' covers 'feature' and
+    # 'perf' covers 'performance'. Labels must match a keyword exactly.
+    _CATEGORY_RULES = (
+        (DOCUMENTATION, re.compile(r'doc'), frozenset()),
+        (BUG_FIXES, re.compile(r'bug|fix'), frozenset({'bug', 'fix', 'hotfix'})),
+        (FEATURES, re.compile(r'feat|enhancement'), frozenset({'feature', 'enhancement', 'feat'})),
+        (CODE_CHANGES, re.compile(r'refactor|perf|test'), frozenset()),
+    )
+
+    def __init__(self, config=None, http_client: Optional[httpx.AsyncClient] = None):
         self.config = config if config is not None else {}
         self.github_token = self._get_github_token()
-        self.github = Github(self.github_token)
+        self.http_client = http_client or get_http_client()
 
     def _get_github_token(self):
         # Use user-provided token if available, otherwise fall back to default
@@ -42,77 +95,83 @@ class ContentProcessor:
         else:
             raise ValueError("No GitHub token provided and no default token found in environment")
 
-    def fetch_pull_requests(self, repo_name: str, days_back: int) -> Dict[str, List[Dict[str, Any]]]:
+    async def fetch_pull_requests(self, repo_name: str, days_back: int) -> Dict[str, List[Dict[str, Any]]]:
         """
         Fetch pull requests from the repository within the specified time period.
         """
         try:
             logger.info(f"Fetching PRs from {repo_name} for the last {days_back} days")
             
-            try:
-                logger.debug(f"Accessing repository {repo_name}...")
-                repo = self.github.get_repo(repo_name)
-                logger.debug(f"Successfully accessed repository: {repo.full_name}")
-            except GithubException as e:
-                logger.error(f"Failed to access repository {repo_name}: {str(e)}")
-                logger.error(f"Error status: {e.status}, Data: {e.data}")
-                if e.status == 404:
-                    raise Exception(f"Repository '{repo_name}' not found. Please check the repository name.")
-                raise Exception(f"Failed to access repository: {str(e)}")
+            owner, name = split_repo_name(repo_name)
             
-            # Create timezone-aware datetime for comparison
+            # GitHub timestamps are always YYYY-MM-DDTHH:MM:SSZ, so they order correctly as strings
             since_date = datetime.now(timezone.utc) - timedelta(days=days_back)
+            since_iso = since_date.strftime('%Y-%m-%dT%H:%M:%SZ')
             pull_requests = []
+            cursor = None
             
-            try:
-                logger.debug("Fetching pull requests...")
-                pulls = repo.get_pulls(state='all', sort='created', direction='desc')
-                logger.debug(f"Got pulls object: {pulls}")
+            while True:
+                try:
+                    logger.debug("Fetching pull requests page after cursor %s...", cursor)
+                    data = await execute_query(
+                        self.http_client,
+                        self.github_token,
+                        PULL_REQUESTS_QUERY,
+                        {'owner': owner, 'name': name, 'cursor': cursor}
+                    )
+                except GitHubGraphQLError as e:
+                    logger.error(f"Failed to fetch pull requests for {repo_name}: {str(e)}")
+                    logger.error(f"Error status: {e.status}, Errors: {e.errors}")
+                    if e.not_found:
+                        raise Exception(f"Repository '{repo_name}' not found. Please check the repository name.")
+                    raise Exception(f"Failed to fetch pull requests: {str(e)}")
                 
-                for pr in pulls:
+                connection = data['repository']['pullRequests']
+                reached_end = False
+                
+                for pr in connection['nodes']:
                     try:
-                        # Ensure PR created_at is timezone-aware
-                        pr_created_at = pr.created_at.replace(tzinfo=timezone.utc) if pr.created_at.tzinfo is None else pr.created_at
-                        
-                        if pr_created_at < since_date:
+                        if pr['createdAt'] < since_iso:
+                            reached_end = True
                             break
                             
-                        logger.debug(f"Processing PR #{pr.number}")
+                        logger.debug("Processing PR #%s", pr['number'])
                         pr_data = {
-                            'number': pr.number,
-                            'title': pr.title,
-                            'body': pr.body or '',
-                            'created_at': pr_created_at.isoformat(),
-                            'state': pr.state,
-                            'url': pr.html_url,
-                            'author': pr.user.login if pr.user else 'Unknown',
-                            'labels': [label.name for label in pr.labels],
-                            'merged': pr.merged if hasattr(pr, 'merged') else False
+                            'number': pr['number'],
+                            'title': pr['title'],
+                            'body': pr['body'] or '',
+                            'created_at': pr['createdAt'],
+                            'state': 'open' if pr['state'] == 'OPEN' else 'closed',
+                            'url': pr['url'],
+                            'author': pr['author']['login'] if pr['author'] else 'Unknown',
+                            'labels': [label['name'] for label in pr['labels']['nodes']],
+                            'merged': pr['merged']
                         }
                         pull_requests.append(pr_data)
-                        logger.debug(f"Successfully processed PR #{pr.number}: {pr.title}")
+                        logger.debug("Successfully processed PR #%s: %s", pr['number'], pr['title'])
                         
                     except Exception as e:
-                        logger.error(f"Error processing PR #{pr.number}: {str(e)}")
+                        logger.error(f"Error processing PR #{pr.get('number')}: {str(e)}")
                         logger.error(traceback.format_exc())
                         continue
-
-                logger.info(f"Successfully fetched {len(pull_requests)} PRs")
-                result = {'pull_requests': pull_requests}
-                logger.debug(f"Returning result: {result}")
-                return result
                 
-            except GithubException as e:
-                logger.error(f"Failed to fetch pull requests: {str(e)}")
-                logger.error(f"Error status: {e.status}, Data: {e.data}")
-                raise Exception(f"Failed to fetch pull requests: {str(e)}")
+                page_info = connection['pageInfo']
+                if reached_end or not page_info['hasNextPage']:
+                    break
+                cursor = page_info['endCursor']
+
+            logger.info(f"Successfully fetched {len(pull_requests)} PRs")
+            result = {'pull_requests': pull_requests}
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Returning result: %s", result)
+            return result
 
         except Exception as e:
             logger.error(f"Error in fetch_pull_requests: {str(e)}")
             logger.error(traceback.format_exc())
             raise
 
-    def fetch_github_content(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    async def fetch_github_content(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
         Main method to fetch content from GitHub.
         """
@@ -120,7 +179,7 @@ class ContentProcessor:
             repo_name = params.get('repo_name')
             days_back = params.get('days_back', 7)
 
-            logger.debug(f"Received params: repo_name={repo_name}, days_back={days_back}")
+            logger.debug("Received params: repo_name=%s, days_back=%s", repo_name, days_back)
 
             if not repo_name:
                 raise ValueError("Repository name is required")
@@ -132,8 +191,9 @@ class ContentProcessor:
             
             try:
                 # Fetch only pull requests for now
-                content = self.fetch_pull_requests(repo_name, days_back)
-                logger.debug(f"Fetched content: {content}")
+                content = await self.fetch_pull_requests(repo_name, days_back)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Fetched content: %s", content)
                 return content
             except Exception as e:
                 logger.error(f"Error fetching pull requests: {str(e)}")
@@ -148,7 +208,7 @@ class ContentProcessor:
             logger.error(traceback.format_exc())
             raise
 
-    def process(self, activity_data: dict) -> dict:
+    def process(self, activity_data: dict) -> Dict[str, List[ProcessedItem]]:
         """
         Process the GitHub activity data and categorize it.
         
@@ -156,93 +216,89 @@ class ContentProcessor:
             activity_data: Dictionary containing 'pulls', 'issues', and 'commits' data
             
         Returns:
-            Dictionary of processed and categorized content
+            Dictionary of categorized items, encoded with msgspec at the API boundary
         """
         try:
             logger.info("Starting content processing")
             
-            processed_content = {
-                'code_changes': [],
-                'bug_fixes': [],
-                'features': [],
-                'documentation': [],
-                'other': []
-            }
-            
-            # Process pull requests
-            for pr in activity_data.get('pulls', []):
-                category = self._categorize_item(pr)
-                item_data = {
-                    'type': 'pull_request',
-                    'number': pr.get('number'),
-                    'title': pr.get('title'),
-                    'body': pr.get('body', ''),
-                    'url': pr.get('url'),
-                    'created_at': pr.get('created_at'),
-                    'author': pr.get('author'),
-                    'labels': pr.get('labels', [])
-                }
-                processed_content[category].append(item_data)
-            
-            # Process issues
-            for issue in activity_data.get('issues', []):
-                category = self._categorize_item(issue)
-                item_data = {
-                    'type': 'issue',
-                    'number': issue.get('number'),
-                    'title': issue.get('title'),
-                    'body': issue.get('body', ''),
-                    'url': issue.get('url'),
-                    'created_at': issue.get('created_at'),
-                    'author': issue.get('author'),
-                    'labels': issue.get('labels', [])
-                }
-                processed_content[category].append(item_data)
+            buckets = [[] for _ in CATEGORIES]
+
+            # Bound once here rather than looked up for every item
+            categorize = self._categorize_item
+            doc_from = self._doc_from
+            append_to = [bucket.append for bucket in buckets]
             
-            # Process commits
-            for commit in activity_data.get('commits', []):
-                category = self._categorize_item(commit)
-                item_data = {
-                    'type': 'commit',
-                    'sha': commit.get('sha'),
-                    'message': commit.get('message'),
-                    'url': commit.get('url'),
-                    'created_at': commit.get('created_at'),
-                    'author': commit.get('author')
-                }
-                processed_content[category].append(item_data)
+            # Each source has its own builder with the field names written out
+            for source, build_item in (
+                ('pulls', self._pull_request_item),
+                ('issues', self._issue_item),
+                ('commits', self._commit_item)
+            ):
+                for item in activity_data.get(source, []):
+                    append_to[categorize(doc_from(item))](build_item(item))
             
             logger.info("Content processing completed successfully")
-            return processed_content
+            return dict(zip(CATEGORIES, buckets))
             
         except Exception as e:
             logger.error(f"Error in process method: {str(e)}")
             logger.error(traceback.format_exc())
             raise
 
-    def _categorize_item(self, item: dict) -> str:
+    @staticmethod
+    def _pull_request_item(pr: dict) -> ProcessedPullRequest:
+        return ProcessedPullRequest(
+            number=pr.get('number'),
+            title=pr.get('title'),
+            body=pr.get('body', ''),
+            url=pr.get('url'),
+            created_at=pr.get('created_at'),
+            author=pr.get('author'),
+            labels=pr.get('labels', [])
+        )
+
+    @staticmethod
+    def _issue_item(issue: dict) -> ProcessedIssue:
+        return ProcessedIssue(
+            number=issue.get('number'),
+            title=issue.get('title'),
+            body=issue.get('body', ''),
+            url=issue.get('url'),
+            created_at=issue.get('created_at'),
+            author=issue.get('author'),
+            labels=issue.get('labels', [])
+        )
+
+    @staticmethod
+    def _commit_item(commit: dict) -> ProcessedCommit:
+        return ProcessedCommit(
+            sha=commit.get('sha'),
+            message=commit.get('message'),
+            url=commit.get('url'),
+            created_at=commit.get('created_at'),
+            author=commit.get('author')
+        )
+
+    @staticmethod
+    def _doc_from(item: dict) -> Tuple[str, FrozenSet[str]]:
         """
-        Categorize an item based on its title, body, and labels.
+        Build the lowercased text and label set an item is categorized by.
         """
-        title = item.get('title', '').lower()
-        body = item.get('body', '').lower()
-        labels = [label.lower() for label in item.get('labels', [])]
-        
-        # Check for documentation changes
-        if any(keyword in title or keyword in body for keyword in ['doc', 'docs', 'documentation']):
-            return 'documentation'
-        
-        # Check for bug fixes
-        if any(keyword in title or keyword in body or keyword in labels for keyword in ['bug', 'fix', 'hotfix']):
-            return 'bug_fixes'
-        
-        # Check for features
-        if any(keyword in title or keyword in body or keyword in labels for keyword in ['feature', 'enhancement', 'feat']):
-            return 'features'
-        
-        # Check for code changes
-        if any(keyword in title or keyword in body for keyword in ['refactor', 'perf', 'performance', 'test']):
-            return 'code_changes'
-        
+        # Title and body are scanned together; no keyword contains a newline
+        text = f"{item.get('title') or ''}\n{item.get('body') or ''}".lower()
+        labels = frozenset(label.lower() for label in item.get('labels', []))
+        return text, labels
+
+    def _categorize_item(self, doc: Tuple[str, FrozenSet[str]]) -> int:
+        """
+        Categorize an item from the (text, labels) built by _doc_from,
+        returning its index in CATEGORIES.
+        """
+        text, labels = doc
+
+        for category, pattern, label_keywords in self._CATEGORY_RULES:
+            if pattern.search(text) or not labels.isdisjoint(label_keywords):
+                return category
+
         # Default category
-        return 'other'
\ No newline at end of file
+        return OTHER
@@ -1,117 +1,199 @@
 import os
-import aiohttp
+import re
+import math
+import httpx
+import orjson
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List
-from dotenv import load_dotenv
+from email.utils import format_datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
 import asyncio
-from tqdm.asyncio import tqdm_asyncio
+from cachetools import LRUCache
+
+from .github_graphql import GITHUB_API_URL
+
+# Largest page size the GitHub REST API accepts
+MAX_PER_PAGE = 100
+
+# GitHub requests kept in flight across every collector sharing a semaphore
+MAX_CONCURRENT_REQUESTS = 8
+
+LAST_PAGE_LINK = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+# (url, params, token) -> (validators, body, Link header) for conditional requests.
+# GitHub does not count 304 responses against the rate limit.
+_response_cache = LRUCache(maxsize=512)
 
 class GitHubCollector:
-    def __init__(self, repo_name: str = None, github_token: str = None):
-        """Initialize the GitHub collector with repo name and token"""
+    def __init__(self, client: httpx.AsyncClient, repo_name: str = None, github_token: str = None,
+                 semaphore: Optional[asyncio.Semaphore] = None):
+        """
+        Initialize the GitHub collector with a shared HTTP/2 client, repo name and token.
+        Pass the app-wide semaphore to cap GitHub requests across concurrent API calls.
+        """
+        self.client = client
+        self._semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
         self.repo_name = repo_name or os.getenv('REPO_NAME')
         self.github_token = github_token or os.getenv('GITHUB_TOKEN')
-        
+
         if not self.repo_name or not self.github_token:
             raise ValueError("Repository name and GitHub token are required")
-        
-        self.base_url = "https://api.github.com"
+
+        self.base_url = GITHUB_API_URL
         self.headers = {
-            'Authorization': f'token {self.github_token}',
-            'Accept': 'application/vnd.github.v3+json'
+            'Authorization': f'token {self.github_token}'
         }
 
-    async def get_session(self):
-        """Create and return an aiohttp session"""
-        return aiohttp.ClientSession(headers=self.headers)
+    async def _fetch_pages(self, url: str, params: Dict, max_items: int,
+                           if_modified_since: Optional[str] = None,
+                           created_since: Optional[str] = None) -> List[Dict]:
+        """
+        Fetch up to max_items results, requesting every page after the first concurrently.
+        Without a cached page to revalidate, if_modified_since (an HTTP date) is sent with
+        the first page and a 304 means there is nothing to return.
+        For lists sorted newest-created first, created_since (an ISO timestamp) skips the
+        remaining pages once the first page already reaches past it.
+        """
+        per_page = min(max_items, MAX_PER_PAGE)
+        params = {**params, 'per_page': per_page}
+
+        async def fetch_page(page: int):
+            page_params = {**params, 'page': page}
+            cache_key = (url, tuple(sorted(page_params.items())), self.github_token)
+            cached = _response_cache.get(cache_key)
+
+            headers = self.headers
+            if cached:
+                headers = {**headers, **cached[0]}
+            elif if_modified_since and page == 1:
+                headers = {**headers, 'If-Modified-Since': if_modified_since}
+
+            async with self._semaphore:
+                response = await self.client.get(url, params=page_params, headers=headers)
+
+            if response.status_code == 304:
+                if cached:
+                    return list(cached[1]), cached[2]
+                return [], None
+            response.raise_for_status()
+            body = orjson.loads(response.content)
+            link_header = response.headers.get('Link')
+
+            validators = {}
+            if 'ETag' in response.headers:
+                validators['If-None-Match'] = response.headers['ETag']
+            if 'Last-Modified' in response.headers:
+                validators['If-Modified-Since'] = response.headers['Last-Modified']
+            if validators:
+                _response_cache[cache_key] = (validators, body, link_header)
+
+            return list(body), link_header
 
-    async def async_fetch_pulls(self, session: aiohttp.ClientSession, days_back: int, max_items: int = 30) -> List[Dict]:
+        items, link_header = await fetch_page(1)
+        page_count = min(math.ceil(max_items / per_page), self._last_page(link_header))
+        if created_since and items and items[-1]['created_at'] < created_since:
+            page_count = 1
+
+        if page_count > 1:
+            pages = await asyncio.gather(*[fetch_page(page) for page in range(2, page_count + 1)])
+            for page_items, _ in pages:
+                items.extend(page_items)
+
+        return items[:max_items]
+
+    def _last_page(self, link_header: Optional[str]) -> int:
+        """Read the last page number from a GitHub Link header"""
+        match = LAST_PAGE_LINK.search(link_header or '')
+        if not match:
+            return 1
+        return int(parse_qs(urlparse(match.group(1)).query).get('page', ['1'])[0])
+
+    def _since(self, days_back: int) -> str:
+        """Cutoff timestamp truncated to the minute so repeated polls share a cache entry"""
+        since = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(days=days_back)
+        return since.isoformat()
+
+    async def async_fetch_pulls(self, days_back: int, max_items: int = 30) -> List[Dict]:
         """Fetch pull requests from the last N days"""
         since_date = datetime.now(timezone.utc) - timedelta(days=days_back)
+        # Compared as strings against created_at, which GitHub always sends in UTC with a 'Z'
+        since_iso = since_date.strftime('%Y-%m-%dT%H:%M:%SZ')
+        # Nothing in the list modified since the cutoff means no PR was created after it either
+        since_http = format_datetime(since_date, usegmt=True)
         url = f"{self.base_url}/repos/{self.repo_name}/pulls"
         params = {
             'state': 'all',
-            'per_page': max_items,
-            'sort': 'updated',
+            'sort': 'created',
             'direction': 'desc'
         }
 
-        async with session.get(url, params=params) as response:
-            pulls = await response.json()
-            
-            processed_pulls = []
-            async for pull in tqdm_asyncio(pulls, desc="Processing PRs"):
-                created_at = datetime.fromisoformat(pull['created_at'].replace('Z', '+00:00'))
-                if created_at >= since_date:
-                    processed_pulls.append({
-                        'number': pull['number'],
-                        'title': pull['title'],
-                        'body': pull['body'],
-                        'state': pull['state'],
-                        'created_at': pull['created_at'],
-                        'updated_at': pull['updated_at'],
-                        'merged_at': pull.get('merged_at'),
-                        'url': pull['html_url'],
-                        'author': pull['user']['login']
-                    })
-                if len(processed_pulls) >= max_items:
-                    break
-            
-            return processed_pulls
-
-    async def async_fetch_commits(self, session: aiohttp.ClientSession, days_back: int, max_items: int = 30) -> List[Dict]:
+        pulls = await self._fetch_pages(url, params, max_items, if_modified_since=since_http,
+                                        created_since=since_iso)
+
+        processed_pulls = []
+        for pull in pulls:
+            # Newest first, so everything after the first PR outside the window is older still
+            if pull['created_at'] < since_iso:
+                break
+            processed_pulls.append({
+                'number': pull['number'],
+                'title': pull['title'],
+                'body': pull['body'],
+                'state': pull['state'],
+                'created_at': pull['created_at'],
+                'updated_at': pull['updated_at'],
+                'merged_at': pull.get('merged_at'),
+                'url': pull['html_url'],
+                'author': pull['user']['login']
+            })
+
+        return processed_pulls
+
+    async def async_fetch_commits(self, days_back: int, max_items: int = 30) -> List[Dict]:
         """Fetch commits from the last N days"""
-        since_date = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat()
+        since_date = self._since(days_back)
         url = f"{self.base_url}/repos/{self.repo_name}/commits"
         params = {
-            'since': since_date,
-            'per_page': max_items
+            'since': since_date
         }
 
-        async with session.get(url, params=params) as response:
-            commits = await response.json()
-            
-            processed_commits = []
-            async for commit in tqdm_asyncio(commits[:max_items], desc="Processing commits"):
-                processed_commits.append({
-                    'sha': commit['sha'],
-                    'message': commit['commit']['message'],
-                    'date': commit['commit']['author']['date'],
-                    'author': commit['commit']['author']['name'],
-                    'url': commit['html_url']
-                })
-            
-            return processed_commits
+        commits = await self._fetch_pages(url, params, max_items)
+
+        return [{
+            'sha': commit['sha'],
+            'message': commit['commit']['message'],
+            'date': commit['commit']['author']['date'],
+            'author': commit['commit']['author']['name'],
+            'url': commit['html_url']
+        } for commit in commits]
 
-    async def async_fetch_issues(self, session: aiohttp.ClientSession, days_back: int, max_items: int = 30) -> List[Dict]:
+    async def async_fetch_issues(self, days_back: int, max_items: int = 30) -> List[Dict]:
         """Fetch issues from the last N days"""
-        since_date = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat()
+        since_date = self._since(days_back)
         url = f"{self.base_url}/repos/{self.repo_name}/issues"
         params = {
             'state': 'all',
-            'since': since_date,
-            'per_page': max_items
+            'since': since_date
         }
 
-        async with session.get(url, params=params) as response:
-            issues = await response.json()
-            
-            processed_issues = []
-            async for issue in tqdm_asyncio(issues, desc="Processing issues"):
-                # Skip pull requests
-                if 'pull_request' not in issue:
-                    processed_issues.append({
-                        'number': issue['number'],
-                        'title': issue['title'],
-                        'body': issue['body'],
-                        'state': issue['state'],
-                        'created_at': issue['created_at'],
-                        'updated_at': issue['updated_at'],
-                        'closed_at': issue.get('closed_at'),
-                        'url': issue['html_url'],
-                        'author': issue['user']['login']
-                    })
-                if len(processed_issues) >= max_items:
-                    break
-            
-            return processed_issues
+        issues = await self._fetch_pages(url, params, max_items)
+
+        processed_issues = []
+        for issue in issues:
+            # Skip pull requests
+            if 'pull_request' not in issue:
+                processed_issues.append({
+                    'number': issue['number'],
+                    'title': issue['title'],
+                    'body': issue['body'],
+                    'state': issue['state'],
+                    'created_at': issue['created_at'],
+                    'updated_at': issue['updated_at'],
+                    'closed_at': issue.get('closed_at'),
+                    'url': issue['html_url'],
+                    'author': issue['user']['login']
+                })
+            if len(processed_issues) >= max_items:
+                break
+
+        return processed_issues
@@ -0,0 +1,116 @@
+from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+import logging
+import httpx
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+
+# Statuses retried besides 403 secondary rate limits
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+# Shared by every processor/enricher so keep-alive connections are reused across requests
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class GitHubGraphQLError(Exception):
+    """Raised when the GitHub GraphQL API rejects a query."""
+
+    def __init__(self, message: str, status: Optional[int] = None, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+    @property
+    def not_found(self) -> bool:
+        return any(error.get('type') == 'NOT_FOUND' for error in self.errors)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    # Network failures, gateway errors and GitHub's rate limiting are worth retrying
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if not isinstance(exc, GitHubGraphQLError):
+        return False
+    if exc.status == 403:
+        return 'rate limit' in str(exc).lower()
+    return exc.status in RETRYABLE_STATUSES
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create a GitHub API client that multiplexes concurrent requests over
+    HTTP/2 on a single kept-alive connection.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        base_url=GITHUB_API_URL,
+        headers={'Accept': 'application/vnd.github+json'},
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=50)
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+@lru_cache(maxsize=32)
+def _auth_headers(token: str) -> Dict[str, str]:
+    return {'Authorization': f'bearer {token}'}
+
+
+def split_repo_name(repo_name: str) -> Tuple[str, str]:
+    owner, name = repo_name.split('/', 1)
+    return owner, name
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=0.5, min=1, max=8),
+    retry=retry_if_exception(_is_retryable),
+    reraise=True
+)
+async def execute_query(
+    client: httpx.AsyncClient,
+    token: str,
+    query: str,
+    variables: Dict[str, Any],
+    allow_partial: bool = False
+) -> Dict[str, Any]:
+    """
+    Run a GraphQL query against the GitHub API and return its data.
+
+    With allow_partial, errors reported alongside data (e.g. one unknown PR
+    number in an aliased query) are logged instead of raised.
+    """
+    response = await client.post(
+        GITHUB_GRAPHQL_URL,
+        json={'query': query, 'variables': variables},
+        headers=_auth_headers(token)
+    )
+
+    if response.status_code != 200:
+        raise GitHubGraphQLError(
+            f"GitHub API returned status {response.status_code}: {response.text}",
+            status=response.status_code
+        )
+
+    payload = response.json()
+    errors = payload.get('errors') or []
+    data = payload.get('data')
+
+    if errors and not (allow_partial and data):
+        message = "; ".join(error.get('message', 'Unknown error') for error in errors)
+        raise GitHubGraphQLError(message, status=response.status_code, errors=errors)
+
+    for error in errors:
+        logger.warning(f"GitHub GraphQL error: {error.get('message', 'Unknown error')}")
+
+    return data
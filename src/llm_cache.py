@@ -0,0 +1,19 @@
+from typing import Optional
+import hashlib
+from cachetools import TTLCache
+
+# Exact-match cache of OpenAI completions, keyed by a hash of the full prompt.
+# Only touched from coroutines on the event loop, so no locking is needed.
+_llm_cache: TTLCache = TTLCache(maxsize=2048, ttl=3600)
+
+
+def prompt_key(model: str, system: str, user: str) -> str:
+    return hashlib.sha256("\0".join((model, system, user)).encode()).hexdigest()
+
+
+def get_cached_completion(key: str) -> Optional[str]:
+    return _llm_cache.get(key)
+
+
+def cache_completion(key: str, content: str) -> None:
+    _llm_cache[key] = content
@@ -1,16 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List
+from contextlib import asynccontextmanager
 import asyncio
+import functools
+import logging
+import msgspec
+import os
+import sys
 from datetime import datetime, timezone
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .github_collector import GitHubCollector
-from .content_processor import ContentProcessor
+from .github_collector import MAX_CONCURRENT_REQUESTS, GitHubCollector
+from .content_processor import ContentProcessor, ProcessedItem
 from .content_generator import ContentGenerator
 from .content_enricher import ContentEnricher
-
-app = FastAPI(title="GitHub Content Pipeline API")
+from .github_graphql import create_http_client
+from .orjson_route import ORJSONRoute
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Configure logging with more details
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+    # One HTTP/2 client for all GitHub calls so concurrent fetches share a connection
+    app.state.http = create_http_client()
+    # Shared by every request's collector; created here, inside the running loop,
+    # since Python 3.9 binds a semaphore to the loop current at construction
+    app.state.github_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # One OpenAI client, and so one connection pool, for every enricher and generator
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    app.state.openai = AsyncOpenAI(api_key=openai_api_key) if openai_api_key else None
+
+    yield
+
+    get_processor.cache_clear()
+    get_enricher.cache_clear()
+    await app.state.http.aclose()
+    if app.state.openai is not None:
+        await app.state.openai.close()
+
+app = FastAPI(title="GitHub Content Pipeline API", default_response_class=ORJSONResponse, lifespan=lifespan)
+app.router.route_class = ORJSONRoute
 
 # Add this after creating the FastAPI app
 app.add_middleware(
@@ -36,23 +79,65 @@ class EnrichmentRequest(BaseModel):
     selected_items: List[Dict]
     github_token: str
 
+# Response bodies are msgspec structs encoded straight to JSON bytes, skipping
+# FastAPI's jsonable_encoder pass over the nested processed_content
+class TotalItems(msgspec.Struct):
+    pulls: int
+    issues: int
+    commits: int
+
+class FetchMetadata(msgspec.Struct):
+    repository: str
+    collected_at: str
+    days_back: int
+    total_items: TotalItems
+
+class FetchResponse(msgspec.Struct):
+    metadata: FetchMetadata
+    processed_content: Dict[str, List[ProcessedItem]]
+
+class GenerationMetadata(msgspec.Struct):
+    generated_at: str
+    content_type: str
+    selected_categories: Optional[List[str]]
+
+class GenerationResponse(msgspec.Struct):
+    metadata: GenerationMetadata
+    generated_content: Dict[str, Any]
+
+_json_encoder = msgspec.json.Encoder()
+
+# Reused per token; processors and enrichers only hold clients owned by the lifespan,
+# so evicting them leaves nothing to close
+@functools.lru_cache(maxsize=64)
+def get_processor(github_token: str) -> ContentProcessor:
+    return ContentProcessor({'github_token': github_token}, http_client=app.state.http)
+
+@functools.lru_cache(maxsize=64)
+def get_enricher(github_token: str) -> ContentEnricher:
+    return ContentEnricher({'github_token': github_token}, http_client=app.state.http, openai_client=app.state.openai)
+
+def _msgspec_response(body: msgspec.Struct) -> Response:
+    return Response(content=_json_encoder.encode(body), media_type="application/json")
+
 @app.post("/api/fetch-github-content")
 async def fetch_github_content(request: GithubFetchRequest):
     try:
         # Initialize collector with the provided repo and token
         collector = GitHubCollector(
+            app.state.http,
             repo_name=request.repo_name,
-            github_token=request.github_token
+            github_token=request.github_token,
+            semaphore=app.state.github_semaphore
         )
         
         # Fetch GitHub data
-        async with await collector.get_session() as session:
-            tasks = [
-                collector.async_fetch_pulls(session, request.days_back),
-                collector.async_fetch_issues(session, request.days_back),
-                collector.async_fetch_commits(session, request.days_back)
-            ]
-            pulls, issues, commits = await asyncio.gather(*tasks)
+        tasks = [
+            collector.async_fetch_pulls(request.days_back),
+            collector.async_fetch_issues(request.days_back),
+            collector.async_fetch_commits(request.days_back)
+        ]
+        pulls, issues, commits = await asyncio.gather(*tasks)
             
         activity_data = {
             'pulls': pulls,
@@ -61,22 +146,22 @@ async def fetch_github_content(request: GithubFetchRequest):
         }
 
         # Process the content
-        processor = ContentProcessor()
+        processor = get_processor(request.github_token)
         processed_content = processor.process(activity_data)
 
-        return {
-            "metadata": {
-                "repository": request.repo_name,
-                "collected_at": datetime.now(timezone.utc).isoformat(),
-                "days_back": request.days_back,
-                "total_items": {
-                    "pulls": len(pulls),
-                    "issues": len(issues),
-                    "commits": len(commits)
-                }
-            },
-            "processed_content": processed_content
-        }
+        return _msgspec_response(FetchResponse(
+            metadata=FetchMetadata(
+                repository=request.repo_name,
+                collected_at=datetime.now(timezone.utc).isoformat(),
+                days_back=request.days_back,
+                total_items=TotalItems(
+                    pulls=len(pulls),
+                    issues=len(issues),
+                    commits=len(commits)
+                )
+            ),
+            processed_content=processed_content
+        ))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -84,17 +169,17 @@ async def fetch_github_content(request: GithubFetchRequest):
 @app.post("/api/enrich-content")
 async def enrich_content(request: EnrichmentRequest):
     try:
-        enricher = ContentEnricher(github_token=request.github_token)
-        enriched_content = enricher.enrich_content(
-            items=request.selected_items,
-            repo_name=request.repo_name
+        enricher = get_enricher(request.github_token)
+        enriched_content = await enricher.enrich_content(
+            repo_name=request.repo_name,
+            selected_items=request.selected_items
         )
         
         return {
             "metadata": {
                 "repository": request.repo_name,
                 "enriched_at": datetime.now(timezone.utc).isoformat(),
-                "total_items": len(enriched_content)
+                "total_items": len(enriched_content['pull_requests'])
             },
             "enriched_content": enriched_content
         }
@@ -105,7 +190,7 @@ async def enrich_content(request: EnrichmentRequest):
 @app.post("/api/generate-content")
 async def generate_content(request: ContentGenerationRequest):
     try:
-        generator = ContentGenerator()
+        generator = ContentGenerator(openai_api_key=os.getenv('OPENAI_API_KEY'), openai_client=app.state.openai)
         
         # Log the incoming request for debugging
         print("Received content generation request:", request)
@@ -114,7 +199,7 @@ async def generate_content(request: ContentGenerationRequest):
         content_to_process = request.processed_content
         
         # Generate content based on type
-        generated_content = generator.generate_content(
+        generated_content = await generator.generate_content(
             content_to_process,  # Pass the entire categorized content
             content_type=request.content_type
         )
@@ -122,16 +207,14 @@ async def generate_content(request: ContentGenerationRequest):
         # Log the generated content
         print("Generated content:", generated_content)
 
-        response = {
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "content_type": request.content_type,
-                "selected_categories": request.selected_categories
-            },
-            "generated_content": generated_content
-        }
-        
-        return response
+        return _msgspec_response(GenerationResponse(
+            metadata=GenerationMetadata(
+                generated_at=datetime.now().isoformat(),
+                content_type=request.content_type,
+                selected_categories=request.selected_categories
+            ),
+            generated_content=generated_content
+        ))
 
     except Exception as e:
         print(f"Error generating content: {str(e)}")